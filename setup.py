@@ -29,7 +29,7 @@ setup(
     packages=["datasette_graphql"],
     entry_points={"datasette": ["graphql = datasette_graphql"]},
     install_requires=["datasette", "graphene>=2.0", "sqlite-utils", "wrapt"],
-    extras_require={"test": ["pytest", "pytest-asyncio", "httpx"]},
+    extras_require={"test": ["pytest", "pytest-asyncio", "httpx", "filelock"]},
     tests_require=["datasette-graphql[test]"],
     package_data={"datasette_graphql": ["templates/*.html"]},
 )
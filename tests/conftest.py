@@ -1,3 +1,7 @@
+import asyncio
+import pytest
+
+
 def pytest_addoption(parser):
     parser.addoption(
         "--rewrite-examples",
@@ -5,3 +9,12 @@ def pytest_addoption(parser):
         default=False,
         help="Rewrite examples/ 'Try this query' links on error",
     )
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # A single loop for the whole session, so session-scoped async
+    # fixtures such as the shared httpx client can be reused by every test
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
@@ -1,10 +1,24 @@
 from datasette.app import Datasette
+from datasette_graphql.utils import _schema_cache
+from filelock import FileLock
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import httpx
+import json
+import os
 import pytest
+import sqlite3
 import sqlite_utils
 
+JSON_HEADERS = {"content-type": "application/json"}
 GIF_1x1 = b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x01D\x00;"
 
 
+async def post_graphql(client, query, path="/graphql", **kwargs):
+    # Extra kwargs such as variables= are added to the JSON request body
+    body = json.dumps({"query": query, **kwargs}).encode("utf-8")
+    return await client.post(path, content=body, headers=JSON_HEADERS)
+
+
 def build_database(db):
     db["users"].insert_all(
         [
@@ -85,15 +99,14 @@ def build_database(db):
     # https://github.com/simonw/datasette-graphql/issues/48
     db["_table_"].insert({"_column_": 1})
     # To test pagination with both rowid, single-pk and compound-pk tables:
-    db["table_with_rowid"].insert_all(
-        [{"name": "Row {}".format(i)} for i in range(1, 22)]
-    )
+    rows = [{"name": f"Row {i}"} for i in range(1, 22)]
+    db["table_with_rowid"].insert_all(rows)
     db["table_with_pk"].insert_all(
-        [{"pk": i, "name": "Row {}".format(i)} for i in range(1, 22)], pk="pk"
+        [{"pk": i, **row} for i, row in enumerate(rows, 1)], pk="pk"
     )
     db["table_with_compound_pk"].insert_all(
         [
-            {"pk1": i, "pk2": j, "name": "Row {} {}".format(i, j)}
+            {"pk1": i, "pk2": j, "name": f"Row {i} {j}"}
             for i in range(1, 4)
             for j in range(1, 8)
         ],
@@ -103,29 +116,155 @@ def build_database(db):
     db.create_view("view_on_repos", "select * from repos")
 
 
-@pytest.fixture(scope="session")
-def db_path(tmp_path_factory):
-    db_directory = tmp_path_factory.mktemp("dbs")
-    db_path = db_directory / "test.db"
-    db = sqlite_utils.Database(db_path)
+def write_test_db(db_path):
+    # Build in memory, then write the finished database to disk in one go
+    db = sqlite_utils.Database(memory=True)
     build_database(db)
-    return db_path
+    dest = sqlite3.connect(str(db_path))
+    db.conn.backup(dest)
+    dest.close()
 
 
-@pytest.fixture(scope="session")
-def db_path2(tmp_path_factory):
-    db_directory = tmp_path_factory.mktemp("dbs")
-    db_path = db_directory / "test2.db"
+def write_test2_db(db_path):
     db = sqlite_utils.Database(db_path)
     db["test_table"].insert({"full_name": "This is a full name"})
+
+
+def shared_db_path(tmp_path_factory, name, write):
+    if not os.environ.get("PYTEST_XDIST_WORKER"):
+        db_path = tmp_path_factory.mktemp("dbs") / name
+        write(db_path)
+        return db_path
+    # Under pytest-xdist each worker runs the session fixtures, so build the
+    # file once in the base directory shared by all of this run's workers
+    db_path = tmp_path_factory.getbasetemp().parent / name
+    with FileLock(str(db_path) + ".lock"):
+        if not db_path.exists():
+            write(db_path)
     return db_path
 
 
+@pytest.fixture(scope="session")
+def db_path(tmp_path_factory):
+    return shared_db_path(tmp_path_factory, "test.db", write_test_db)
+
+
+@pytest.fixture(scope="session")
+def db_path2(tmp_path_factory):
+    return shared_db_path(tmp_path_factory, "test2.db", write_test2_db)
+
+
 @pytest.fixture(scope="session")
 def ds(db_path):
     return Datasette([db_path])
 
 
+def plugin_metadata(**config):
+    return {"plugins": {"datasette-graphql": config}}
+
+
+def table_metadata(table, config):
+    return {"databases": {"test": {"tables": {table: config}}}}
+
+
+# Datasette instances with non-default configuration, each built once per
+# session. Pair them with fresh_schema_cache if the configuration changes
+# the GraphQL schema for a database that is cached under the same name.
+
+
+@pytest.fixture(scope="session")
+def ds_camelcase(request, db_path2):
+    # Parametrize indirectly with the auto_camelcase setting
+    return Datasette([db_path2], metadata=plugin_metadata(auto_camelcase=request.param))
+
+
+@pytest.fixture(scope="session")
+def ds_cors(request, db_path):
+    # Parametrize indirectly with the cors setting
+    return Datasette([db_path], cors=request.param)
+
+
+@pytest.fixture(scope="session")
+def ds_json_columns(db_path):
+    return Datasette(
+        [db_path],
+        metadata=table_metadata("repos", plugin_metadata(json_columns=["tags"])),
+    )
+
+
+@pytest.fixture(scope="session")
+def ds_fts_view(db_path):
+    return Datasette(
+        [db_path],
+        metadata=table_metadata(
+            "view_on_repos", {"fts_table": "repos_fts", "fts_pk": "id"}
+        ),
+    )
+
+
+@pytest.fixture(scope="session")
+def ds_time_limit(db_path):
+    return Datasette([db_path], metadata=plugin_metadata(time_limit_ms=1))
+
+
+@pytest.fixture(scope="session")
+def ds_query_limit(db_path):
+    return Datasette([db_path], metadata=plugin_metadata(num_queries_limit=2))
+
+
+@pytest.fixture(scope="session")
+def ds_no_limits(db_path):
+    return Datasette(
+        [db_path], metadata=plugin_metadata(num_queries_limit=0, time_limit_ms=0)
+    )
+
+
+@pytest.fixture(scope="session")
+def ds_app(ds):
+    return ds.app()
+
+
+@pytest.fixture(scope="session")
+def transport(ds_app):
+    return httpx.ASGITransport(app=ds_app)
+
+
+@pytest.fixture(scope="session")
+def client(event_loop, transport):
+    # A plain fixture that runs on the session event loop: session-scoped
+    # async fixtures need pytest-asyncio 0.17+, which dropped Python 3.6.
+    # The client is shared by every test, so its cookie jar refuses all
+    # cookies - otherwise a single HTML page view would store Datasette's
+    # CSRF cookie and every later POST would fail with a 403.
+    no_cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+    client = httpx.AsyncClient(
+        transport=transport, base_url="http://localhost", cookies=no_cookies
+    )
+    yield client
+    event_loop.run_until_complete(client.aclose())
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_schema_cache(event_loop, client):
+    # Build the schema for the shared fixture database once per session.
+    # Tests that need a differently configured schema should construct
+    # their own Datasette and use the fresh_schema_cache fixture.
+    response = event_loop.run_until_complete(post_graphql(client, "{ __typename }"))
+    assert response.status_code == 200, response.json()
+    return _schema_cache
+
+
+@pytest.fixture
+def fresh_schema_cache():
+    # Run the test against an empty schema cache, then put back the
+    # schemas built by warm_schema_cache so other tests can reuse them
+    saved = dict(_schema_cache)
+    _schema_cache.clear()
+    yield _schema_cache
+    _schema_cache.clear()
+    _schema_cache.update(saved)
+
+
 if __name__ == "__main__":
     import sys
 
@@ -2,7 +2,7 @@ import pathlib
 import pytest
 import re
 import urllib
-from .test_graphql import graphql_re, variables_re
+from .test_graphql import fenced_blocks
 
 link_re = re.compile(r"\[Try this query]\((.*?)\)")
 
@@ -13,11 +13,10 @@ link_re = re.compile(r"\[Try this query]\((.*?)\)")
 def test_examples_link_to_live_demo(request, path):
     should_rewrite = request.config.getoption("--rewrite-examples")
     content = path.read_text()
-    query = graphql_re.search(content)[1]
-    try:
-        variables = variables_re.search(content)[1]
-    except TypeError:
-        variables = None
+    blocks = fenced_blocks(content)
+    graphql = blocks["graphql"]
+    query = graphql.body
+    variables = blocks["json+variables"].body if "json+variables" in blocks else None
     args = {"query": query}
     if variables:
         args["variables"] = variables
@@ -29,11 +28,12 @@ def test_examples_link_to_live_demo(request, path):
     link_match = link_re.search(content)
     if link_match is None:
         if should_rewrite:
-            ideal_content = graphql_re.sub(
-                "```graphql\n{}\n```\n[Try this query]({})\n".format(
+            ideal_content = (
+                content[: graphql.start]
+                + "```graphql\n{}\n```\n[Try this query]({})\n".format(
                     query.strip(), expected_url
-                ),
-                content,
+                )
+                + content[graphql.end :]
             )
             path.write_text(ideal_content)
             return
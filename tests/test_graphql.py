@@ -1,36 +1,77 @@
+from collections import namedtuple
 from datasette.app import Datasette
-from datasette_graphql.utils import _schema_cache
 import json
 import pathlib
 import pytest
 import re
-import httpx
-from .fixtures import ds, db_path, db_path2
+from .fixtures import (
+    ds,
+    ds_app,
+    transport,
+    client,
+    warm_schema_cache,
+    fresh_schema_cache,
+    post_graphql,
+    JSON_HEADERS,
+    ds_camelcase,
+    ds_cors,
+    ds_json_columns,
+    ds_fts_view,
+    ds_time_limit,
+    ds_query_limit,
+    ds_no_limits,
+    db_path,
+    db_path2,
+)
 
 
 @pytest.mark.asyncio
-async def test_plugin_is_installed():
-    app = Datasette([], memory=True).app()
-    async with httpx.AsyncClient(app=app) as client:
-        response = await client.get("http://localhost/-/plugins.json")
-        assert 200 == response.status_code
-        installed_plugins = {p["name"] for p in response.json()}
-        assert "datasette-graphql" in installed_plugins
+async def test_plugin_is_installed(ds):
+    response = await ds.client.get("/-/plugins.json")
+    assert 200 == response.status_code
+    installed_plugins = {p["name"] for p in response.json()}
+    assert "datasette-graphql" in installed_plugins
 
 
 @pytest.mark.asyncio
-async def test_graphiql():
-    app = Datasette([], memory=True).app()
-    async with httpx.AsyncClient(app=app) as client:
-        response = await client.get(
-            "http://localhost/graphql", headers={"Accept": "text/html"}
-        )
-        assert 200 == response.status_code
-        assert "<title>GraphiQL</title>" in response.text
+async def test_graphiql(client):
+    response = await client.get("/graphql", headers={"Accept": "text/html"})
+    assert 200 == response.status_code
+    assert "<title>GraphiQL</title>" in response.text
+
+
+_EXPECTED_QUERY_FIELDS = frozenset(
+    {
+        "_1_images_row",
+        "_1_images",
+        "t_table_",
+        "t_table__row",
+        "issues_row",
+        "issues",
+        "licenses_row",
+        "licenses",
+        "repos_row",
+        "repos",
+        "table_with_compound_pk_row",
+        "table_with_compound_pk",
+        "table_with_pk_row",
+        "table_with_pk",
+        "table_with_rowid_row",
+        "table_with_rowid",
+        "type_compound_key",
+        "type_compound_key_row",
+        "users_row",
+        "users",
+        "view_on_table_with_pk_row",
+        "view_on_table_with_pk",
+        "view_on_repos_row",
+        "view_on_repos",
+    }
+)
 
 
 @pytest.mark.asyncio
-async def test_query_fields(ds):
+async def test_query_fields(client):
     query = """
     {
         __schema {
@@ -42,39 +83,12 @@ async def test_query_fields(ds):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 200
-        fields = {
-            f["name"]
-            for f in response.json()["data"]["__schema"]["queryType"]["fields"]
-        }
-        assert fields == {
-            "_1_images_row",
-            "_1_images",
-            "t_table_",
-            "t_table__row",
-            "issues_row",
-            "issues",
-            "licenses_row",
-            "licenses",
-            "repos_row",
-            "repos",
-            "table_with_compound_pk_row",
-            "table_with_compound_pk",
-            "table_with_pk_row",
-            "table_with_pk",
-            "table_with_rowid_row",
-            "table_with_rowid",
-            "type_compound_key",
-            "type_compound_key_row",
-            "users_row",
-            "users",
-            "view_on_table_with_pk_row",
-            "view_on_table_with_pk",
-            "view_on_repos_row",
-            "view_on_repos",
-        }
+    response = await post_graphql(client, query)
+    assert response.status_code == 200
+    fields = {
+        f["name"] for f in response.json()["data"]["__schema"]["queryType"]["fields"]
+    }
+    assert fields == _EXPECTED_QUERY_FIELDS
 
 
 @pytest.mark.asyncio
@@ -99,49 +113,74 @@ async def test_query_fields(ds):
         ),
     ],
 )
-async def test_graphql_errors(ds, query, expected_errors):
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 500
-        assert response.json()["errors"] == expected_errors
+async def test_graphql_errors(client, query, expected_errors):
+    response = await post_graphql(client, query)
+    assert response.status_code == 500
+    assert response.json()["errors"] == expected_errors
+
+
+examples_dir = pathlib.Path(__file__).parent.parent / "examples"
+
 
+FencedBlock = namedtuple("FencedBlock", ("body", "start", "end"))
 
-graphql_re = re.compile(r"```graphql(.*?)```", re.DOTALL)
-json_re = re.compile(r"```json\n(.*?)```", re.DOTALL)
-variables_re = re.compile(r"```json\+variables\n(.*?)```", re.DOTALL)
+
+def fenced_blocks(content):
+    # Maps each fence's info string (graphql, json, json+variables) to the
+    # first block that uses it, in a single pass over the text. body is
+    # everything between the info string and the closing fence; start and
+    # end span the whole block, fences included, for rewriting it in place
+    blocks = {}
+    end = 0
+    while True:
+        start = content.find("```", end)
+        close = content.find("```", start + 3) if start != -1 else -1
+        if close == -1:
+            return blocks
+        end = close + 3
+        inner = content[start + 3 : close]
+        info = inner.split("\n", 1)[0]
+        blocks.setdefault(info.strip(), FencedBlock(inner[len(info) :], start, end))
+
+
+def _load_examples():
+    examples = []
+    for path in sorted(examples_dir.glob("*.md")):
+        blocks = fenced_blocks(path.read_text())
+        try:
+            query = blocks["graphql"].body
+            variables = (
+                json.loads(blocks["json+variables"].body)
+                if "json+variables" in blocks
+                else {}
+            )
+            expected = json.loads(blocks["json"].body)
+        except (KeyError, ValueError) as e:
+            # A malformed example should only fail its own test, not stop
+            # the whole module from being collected
+            reason = "{} is malformed: {!r}".format(path.name, e)
+            mark = pytest.mark.xfail(reason=reason, run=False)
+            examples.append(pytest.param(None, None, None, id=path.name, marks=mark))
+            continue
+        examples.append(pytest.param(query, variables, expected, id=path.name))
+    return examples
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "path", (pathlib.Path(__file__).parent.parent / "examples").glob("*.md")
-)
-async def test_graphql_examples(ds, path):
-    content = path.read_text()
-    query = graphql_re.search(content)[1]
-    try:
-        variables = variables_re.search(content)[1]
-    except TypeError:
-        variables = "{}"
-    expected = json.loads(json_re.search(content)[1])
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post(
-            "http://localhost/graphql",
-            json={"query": query, "variables": json.loads(variables),},
-        )
-        assert response.status_code == 200, response.json()
-        if response.json()["data"] != expected:
-            print("Actual:")
-            print(json.dumps(response.json()["data"], indent=4))
-        assert response.json()["data"] == expected
+@pytest.mark.parametrize("query,variables,expected", _load_examples())
+async def test_graphql_examples(client, query, variables, expected):
+    response = await post_graphql(client, query, variables=variables)
+    response_json = response.json()
+    assert response.status_code == 200, response_json
+    if response_json["data"] != expected:
+        print("Actual:")
+        print(json.dumps(response_json["data"], indent=4))
+    assert response_json["data"] == expected
 
 
 @pytest.mark.asyncio
-async def test_graphql_error(ds):
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post(
-            "http://localhost/graphql",
-            json={
-                "query": """{
+async def test_graphql_error(client):
+    query = """{
                     users {
                         nodes {
                             nam2
@@ -149,33 +188,31 @@ async def test_graphql_error(ds):
                         }
                     }
                 }"""
-            },
-        )
-        assert response.status_code == 500
-        assert response.json() == {
-            "data": None,
-            "errors": [
-                {
-                    "message": 'Cannot query field "nam2" on type "users". Did you mean "name"?',
-                    "locations": [{"line": 4, "column": 29}],
-                }
-            ],
-        }
+    response = await post_graphql(client, query)
+    assert response.status_code == 500
+    assert response.json() == {
+        "data": None,
+        "errors": [
+            {
+                "message": 'Cannot query field "nam2" on type "users". Did you mean "name"?',
+                "locations": [{"line": 4, "column": 29}],
+            }
+        ],
+    }
 
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
-    "on,expected",
+    "ds_camelcase,expected",
     [
         (True, {"testTable": {"nodes": [{"fullName": "This is a full name"}]}}),
         (False, {"test_table": {"nodes": [{"full_name": "This is a full name"}]}}),
     ],
+    indirect=["ds_camelcase"],
 )
-async def test_graphql_auto_camelcase(db_path2, on, expected):
-    _schema_cache.clear()
-    ds = Datasette(
-        [db_path2], metadata={"plugins": {"datasette-graphql": {"auto_camelcase": on}}}
-    )
+async def test_graphql_auto_camelcase(ds_camelcase, fresh_schema_cache, expected):
+    ds = ds_camelcase
+    on = ds.plugin_config("datasette-graphql")["auto_camelcase"]
     query = """
     {
         TABLE {
@@ -189,61 +226,97 @@ async def test_graphql_auto_camelcase(db_path2, on, expected):
     ).replace(
         "TABLE", "testTable" if on else "test_table"
     )
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 200
-        assert response.json() == {"data": expected}
+    response = await post_graphql(ds.client, query)
+    assert response.status_code == 200
+    assert response.json() == {"data": expected}
 
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "table", ["table_with_pk", "table_with_rowid", "table_with_compound_pk"]
 )
-async def test_graphql_pagination(ds, table):
-    # Every table should have 21 items, so should paginate 3 times
-    after = None
-    names_from_nodes = []
-    names_from_edges = []
-    while True:
-        args = ["first: 10"]
-        if after:
-            args.append('after: "{}"'.format(after))
-        query = """
-        {
-            TABLE(ARGS) {
-                totalCount
-                pageInfo {
-                    endCursor
-                    hasNextPage
-                }
-                nodes {
+async def test_graphql_pagination_contents(client, table):
+    # Every table should have 21 items, all returned in a single page
+    query = """
+    {
+        TABLE(first: 25) {
+            totalCount
+            pageInfo {
+                endCursor
+                hasNextPage
+            }
+            nodes {
+                name
+            }
+            edges {
+                node {
                     name
                 }
-                edges {
-                    node {
-                        name
-                    }
-                }
             }
         }
-        """.replace(
-            "TABLE", table
-        ).replace(
-            "ARGS", ", ".join(args)
-        )
-        async with httpx.AsyncClient(app=ds.app()) as client:
-            response = await client.post(
-                "http://localhost/graphql", json={"query": query}
-            )
-            assert response.status_code == 200
-            data = response.json()["data"]
-            names_from_nodes.extend([n["name"] for n in data[table]["nodes"]])
-            names_from_edges.extend([e["node"]["name"] for e in data[table]["edges"]])
-            after = data[table]["pageInfo"]["endCursor"]
-            assert data[table]["pageInfo"]["hasNextPage"] == bool(after)
-            assert data[table]["totalCount"] == 21
-            if not after:
-                break
+    }
+    """.replace(
+        "TABLE", table
+    )
+    response = await post_graphql(client, query)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    names_from_nodes = [n["name"] for n in data[table]["nodes"]]
+    names_from_edges = [e["node"]["name"] for e in data[table]["edges"]]
+    assert data[table]["totalCount"] == 21
+    assert data[table]["pageInfo"]["endCursor"] is None
+    assert not data[table]["pageInfo"]["hasNextPage"]
+    assert len(names_from_nodes) == 21
+    assert len(names_from_edges) == 21
+    assert len(set(names_from_nodes)) == 21
+    assert len(set(names_from_edges)) == 21
+
+
+@pytest.mark.asyncio
+async def test_graphql_pagination_cursor(client):
+    # 21 items, so should paginate 3 times. Cursors for a single integer
+    # primary key are the last pk seen, so all three pages can be fetched
+    # with one query - each endCursor must match the next page's after
+    query = """
+    {
+        page1: table_with_pk(first: 10) {
+            ...page
+        }
+        page2: table_with_pk(first: 10, after: "10") {
+            ...page
+        }
+        page3: table_with_pk(first: 10, after: "20") {
+            ...page
+        }
+    }
+    fragment page on table_with_pkCollection {
+        totalCount
+        pageInfo {
+            endCursor
+            hasNextPage
+        }
+        nodes {
+            name
+        }
+        edges {
+            node {
+                name
+            }
+        }
+    }
+    """
+    response = await post_graphql(client, query)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    pages = [data["page1"], data["page2"], data["page3"]]
+    assert [page["pageInfo"]["endCursor"] for page in pages] == ["10", "20", None]
+    names_from_nodes = []
+    names_from_edges = []
+    for page in pages:
+        names_from_nodes.extend([n["name"] for n in page["nodes"]])
+        names_from_edges.extend([e["node"]["name"] for e in page["edges"]])
+        assert page["pageInfo"]["hasNextPage"] == bool(page["pageInfo"]["endCursor"])
+        assert page["totalCount"] == 21
     assert len(names_from_nodes) == 21
     assert len(names_from_edges) == 21
     assert len(set(names_from_nodes)) == 21
@@ -262,33 +335,17 @@ async def test_graphql_multiple_databases(db_path, db_path2):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post(
-            "http://localhost/graphql/test2", json={"query": query}
-        )
-        assert response.status_code == 200, response.json()
-        assert response.json() == {
-            "data": {"test_table": {"nodes": [{"full_name": "This is a full name"}]}}
-        }
+    response = await post_graphql(ds.client, query, path="/graphql/test2")
+    response_json = response.json()
+    assert response.status_code == 200, response_json
+    assert response_json == {
+        "data": {"test_table": {"nodes": [{"full_name": "This is a full name"}]}}
+    }
 
 
 @pytest.mark.asyncio
-async def test_graphql_json_columns(db_path):
-    _schema_cache.clear()
-    ds = Datasette(
-        [db_path],
-        metadata={
-            "databases": {
-                "test": {
-                    "tables": {
-                        "repos": {
-                            "plugins": {"datasette-graphql": {"json_columns": ["tags"]}}
-                        }
-                    }
-                }
-            }
-        },
-    )
+async def test_graphql_json_columns(ds_json_columns, fresh_schema_cache):
+    ds = ds_json_columns
     query = """
     {
         repos {
@@ -299,61 +356,78 @@ async def test_graphql_json_columns(db_path):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 200, response.json()
-        assert response.json() == {
-            "data": {
-                "repos": {
-                    "nodes": [
-                        {
-                            "full_name": "simonw/datasette",
-                            "tags": ["databases", "apis"],
-                        },
-                        {"full_name": "cleopaws/dogspotter", "tags": ["dogs"]},
-                        {"full_name": "simonw/private", "tags": []},
-                    ]
-                }
+    response = await post_graphql(ds.client, query)
+    response_json = response.json()
+    assert response.status_code == 200, response_json
+    assert response_json == {
+        "data": {
+            "repos": {
+                "nodes": [
+                    {
+                        "full_name": "simonw/datasette",
+                        "tags": ["databases", "apis"],
+                    },
+                    {"full_name": "cleopaws/dogspotter", "tags": ["dogs"]},
+                    {"full_name": "simonw/private", "tags": []},
+                ]
             }
         }
+    }
 
 
 @pytest.mark.asyncio
-async def test_graphql_output_schema(ds):
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.options("http://localhost/graphql/test.graphql")
-        assert response.status_code == 200
-        for fragment in (
-            "schema {\n  query: Query\n}",
-            "input IntegerOperations {",
-            "users(filter: [usersFilter], where: String, first: Int, after: String, sort: usersSort, sort_desc: usersSortDesc): usersCollection",
-            "users_row(filter: [usersFilter], where: String, after: String, sort: usersSort, sort_desc: usersSortDesc, id: Int): users",
-            "type _1_images {",
-            "type _1_imagesCollection {",
-            "type _1_imagesEdge {",
-            "input _1_imagesFilter {",
-            "enum _1_imagesSort {",
-            "enum _1_imagesSortDesc {",
-        ):
-            assert fragment in response.text
+async def test_graphql_output_schema(client):
+    response = await client.options("/graphql/test.graphql")
+    assert response.status_code == 200
+    for fragment in (
+        "schema {\n  query: Query\n}",
+        "input IntegerOperations {",
+        "users(filter: [usersFilter], where: String, first: Int, after: String, sort: usersSort, sort_desc: usersSortDesc): usersCollection",
+        "users_row(filter: [usersFilter], where: String, after: String, sort: usersSort, sort_desc: usersSortDesc, id: Int): users",
+        "type _1_images {",
+        "type _1_imagesCollection {",
+        "type _1_imagesEdge {",
+        "input _1_imagesFilter {",
+        "enum _1_imagesSort {",
+        "enum _1_imagesSortDesc {",
+    ):
+        assert fragment in response.text
+
+
+_CORS_HEADERS = {
+    "access-control-allow-headers": "content-type",
+    "access-control-allow-method": "POST",
+    "access-control-allow-origin": "*",
+}
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize("cors_enabled", [True, False])
-async def test_cors_headers(db_path, cors_enabled):
-    ds = Datasette([db_path], cors=cors_enabled,)
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.options("http://localhost/graphql")
-        assert response.status_code == 200
-        desired_headers = {
-            "access-control-allow-headers": "content-type",
-            "access-control-allow-method": "POST",
-            "access-control-allow-origin": "*",
-        }.items()
-        if cors_enabled:
-            assert desired_headers <= dict(response.headers).items()
-        else:
-            assert not desired_headers <= dict(response.headers).items()
+@pytest.mark.parametrize(
+    "ds_cors,cors_enabled", [(True, True), (False, False)], indirect=["ds_cors"]
+)
+async def test_cors_headers(ds_cors, cors_enabled):
+    response = await ds_cors.client.options("/graphql")
+    assert response.status_code == 200
+    desired_headers = _CORS_HEADERS.items()
+    if cors_enabled:
+        assert desired_headers <= dict(response.headers).items()
+    else:
+        assert not desired_headers <= dict(response.headers).items()
+
+
+_OPERATION_NAME_QUERY = """
+query Q1 {
+    users_row {
+        name
+    }
+}
+query Q2 {
+    users_row {
+        id
+    }
+}
+"""
+_OPERATION_NAME_QUERY_JSON = json.dumps(_OPERATION_NAME_QUERY)
 
 
 @pytest.mark.asyncio
@@ -376,26 +450,18 @@ async def test_cors_headers(db_path, cors_enabled):
         ),
     ],
 )
-async def test_operation_name(ds, operation_name, expected_status, expected_data):
-    query = """
-    query Q1 {
-        users_row {
-            name
-        }
-    }
-    query Q2 {
-        users_row {
-            id
-        }
-    }
-    """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post(
-            "http://localhost/graphql",
-            json={"query": query, "operationName": operation_name},
-        )
-        assert response.status_code == expected_status, response.json()
-        assert response.json() == expected_data
+async def test_operation_name(client, operation_name, expected_status, expected_data):
+    # The body is assembled by hand instead of going through post_graphql()
+    # so the shared query is JSON-encoded once, not once per parametrized case
+    content = '{{"query": {}, "operationName": {}}}'.format(
+        _OPERATION_NAME_QUERY_JSON, json.dumps(operation_name)
+    )
+    response = await client.post(
+        "/graphql", content=content.encode("utf-8"), headers=JSON_HEADERS,
+    )
+    response_json = response.json()
+    assert response.status_code == expected_status, response_json
+    assert response_json == expected_data
 
 
 @pytest.mark.asyncio
@@ -447,30 +513,17 @@ async def test_operation_name(ds, operation_name, expected_status, expected_data
         ),
     ],
 )
-async def test_graphql_http_get(ds, query, extra_query_string, expected_data):
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        params = dict(extra_query_string)
-        params["query"] = query
-        response = await client.get("http://localhost/graphql", params=params)
-        assert response.status_code == 200
-        assert response.json() == expected_data
+async def test_graphql_http_get(client, query, extra_query_string, expected_data):
+    params = dict(extra_query_string)
+    params["query"] = query
+    response = await client.get("/graphql", params=params)
+    assert response.status_code == 200
+    assert response.json() == expected_data
 
 
 @pytest.mark.asyncio
-async def test_configured_fts_search_for_view(db_path):
-    _schema_cache.clear()
-    ds = Datasette(
-        [db_path],
-        metadata={
-            "databases": {
-                "test": {
-                    "tables": {
-                        "view_on_repos": {"fts_table": "repos_fts", "fts_pk": "id"}
-                    }
-                }
-            }
-        },
-    )
+async def test_configured_fts_search_for_view(ds_fts_view, fresh_schema_cache):
+    ds = ds_fts_view
     query = """
     {
         view_on_repos(search: "dogspotter") {
@@ -481,24 +534,23 @@ async def test_configured_fts_search_for_view(db_path):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 200
-        assert response.json() == {
-            "data": {
-                "view_on_repos": {
-                    "nodes": [{"id": 2, "full_name": "cleopaws/dogspotter"}]
-                }
-            }
+    response = await post_graphql(ds.client, query)
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": {
+            "view_on_repos": {"nodes": [{"id": 2, "full_name": "cleopaws/dogspotter"}]}
         }
-    _schema_cache.clear()
+    }
+
+
+_TIME_LIMIT_RE = re.compile(
+    r"Time limit exceeded: .* > 1ms - /test/repos\.json\?_size=10&_search=dogspotter"
+)
 
 
 @pytest.mark.asyncio
-async def test_time_limit_ms(db_path):
-    ds = Datasette(
-        [db_path], metadata={"plugins": {"datasette-graphql": {"time_limit_ms": 1}}}
-    )
+async def test_time_limit_ms(ds_time_limit):
+    ds = ds_time_limit
     query = """
     {
         repos(search: "dogspotter") {
@@ -509,23 +561,17 @@ async def test_time_limit_ms(db_path):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 500
-        response_json = response.json()
-        assert response_json["data"] == {"repos": None}
-        assert len(response_json["errors"]) == 1
-        assert response_json["errors"][0]["message"].startswith("Time limit exceeded: ")
-        assert response_json["errors"][0]["message"].endswith(
-            " > 1ms - /test/repos.json?_size=10&_search=dogspotter"
-        )
+    response = await post_graphql(ds.client, query)
+    assert response.status_code == 500
+    response_json = response.json()
+    assert response_json["data"] == {"repos": None}
+    assert len(response_json["errors"]) == 1
+    assert _TIME_LIMIT_RE.fullmatch(response_json["errors"][0]["message"])
 
 
 @pytest.mark.asyncio
-async def test_num_queries_limit(db_path):
-    ds = Datasette(
-        [db_path], metadata={"plugins": {"datasette-graphql": {"num_queries_limit": 2}}}
-    )
+async def test_num_queries_limit(ds_query_limit):
+    ds = ds_query_limit
     query = """
     {
         users {
@@ -541,44 +587,34 @@ async def test_num_queries_limit(db_path):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 500
-        assert response.json() == {
-            "data": {
-                "users": {
-                    "nodes": [
-                        {
-                            "id": 1,
-                            "name": "cleopaws",
-                            "repos_list": {
-                                "nodes": [{"full_name": "cleopaws/dogspotter"}]
-                            },
-                        },
-                        {"id": 2, "name": "simonw", "repos_list": None},
-                    ]
-                }
-            },
-            "errors": [
-                {
-                    "message": "Query limit exceeded: 3 > 2 - /test/repos.json?_size=10&owner=2",
-                    "locations": [{"line": 7, "column": 17}],
-                    "path": ["users", "nodes", 1, "repos_list"],
-                }
-            ],
-        }
+    response = await post_graphql(ds.client, query)
+    assert response.status_code == 500
+    assert response.json() == {
+        "data": {
+            "users": {
+                "nodes": [
+                    {
+                        "id": 1,
+                        "name": "cleopaws",
+                        "repos_list": {"nodes": [{"full_name": "cleopaws/dogspotter"}]},
+                    },
+                    {"id": 2, "name": "simonw", "repos_list": None},
+                ]
+            }
+        },
+        "errors": [
+            {
+                "message": "Query limit exceeded: 3 > 2 - /test/repos.json?_size=10&owner=2",
+                "locations": [{"line": 7, "column": 17}],
+                "path": ["users", "nodes", 1, "repos_list"],
+            }
+        ],
+    }
 
 
 @pytest.mark.asyncio
-async def test_time_limits_0(db_path):
-    ds = Datasette(
-        [db_path],
-        metadata={
-            "plugins": {
-                "datasette-graphql": {"num_queries_limit": 0, "time_limit_ms": 0}
-            }
-        },
-    )
+async def test_time_limits_0(ds_no_limits):
+    ds = ds_no_limits
     query = """
     {
         users {
@@ -594,31 +630,28 @@ async def test_time_limits_0(db_path):
         }
     }
     """
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.post("http://localhost/graphql", json={"query": query})
-        assert response.status_code == 200
-        assert response.json() == {
-            "data": {
-                "users": {
-                    "nodes": [
-                        {
-                            "id": 1,
-                            "name": "cleopaws",
-                            "repos_list": {
-                                "nodes": [{"full_name": "cleopaws/dogspotter"}]
-                            },
-                        },
-                        {
-                            "id": 2,
-                            "name": "simonw",
-                            "repos_list": {
-                                "nodes": [
-                                    {"full_name": "simonw/datasette"},
-                                    {"full_name": "simonw/private"},
-                                ]
-                            },
+    response = await post_graphql(ds.client, query)
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": {
+            "users": {
+                "nodes": [
+                    {
+                        "id": 1,
+                        "name": "cleopaws",
+                        "repos_list": {"nodes": [{"full_name": "cleopaws/dogspotter"}]},
+                    },
+                    {
+                        "id": 2,
+                        "name": "simonw",
+                        "repos_list": {
+                            "nodes": [
+                                {"full_name": "simonw/datasette"},
+                                {"full_name": "simonw/private"},
+                            ]
                         },
-                    ]
-                }
+                    },
+                ]
             }
         }
+    }
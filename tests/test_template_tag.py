@@ -5,7 +5,6 @@ from graphql import graphql
 import sqlite_utils
 import pytest
 from unittest import mock
-import httpx
 from .fixtures import db_path
 
 TEMPLATE = r'''
@@ -57,7 +56,6 @@ async def test_schema_caching(tmp_path_factory, db_path, template, expected):
     (pages_dir / "about.html").write_text(template)
 
     ds = Datasette([db_path], template_dir=template_dir)
-    async with httpx.AsyncClient(app=ds.app()) as client:
-        response = await client.get("http://localhost/about")
-        assert response.status_code == 200
-        assert response.text.strip() == expected
+    response = await ds.client.get("/about")
+    assert response.status_code == 200
+    assert response.text.strip() == expected